@@ -0,0 +1,11 @@
+-- Indexes used by the dashboard queries in Tennis_game.py
+-- Run once against the Tennis_Game database.
+-- The join columns are foreign keys, so InnoDB already indexes them.
+USE Tennis_Game;
+
+-- Top 10 players: ORDER BY `rank` LIMIT 10
+CREATE INDEX idx_rank ON competitor_rankings (`rank`);
+
+-- Sidebar filter options: SELECT DISTINCT ... ORDER BY country / category_name
+CREATE INDEX idx_country ON competitors (country);
+CREATE INDEX idx_category_name ON categories (category_name);
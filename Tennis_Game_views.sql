@@ -0,0 +1,19 @@
+-- Joined views read by the dashboard in Tennis_game.py
+-- Run once against the Tennis_Game database (after creating the tables).
+-- LEFT JOIN keeps rows without a match, like pd.merge(how="left").
+USE Tennis_Game;
+
+CREATE OR REPLACE VIEW v_rankings AS
+SELECT r.competitor_id, r.`rank`, r.movement, r.points, r.competitions_played, c.name, c.country
+FROM competitor_rankings r
+LEFT JOIN competitors c ON r.competitor_id = c.competitor_id;
+
+CREATE OR REPLACE VIEW v_venues AS
+SELECT v.venue_name, v.city_name, v.country_name, v.time_zone, v.complex_id, cx.complex_name
+FROM venues v
+LEFT JOIN complexes cx ON v.complex_id = cx.complex_id;
+
+CREATE OR REPLACE VIEW v_competitions AS
+SELECT co.competition_name, co.type, co.gender, co.category_id, ca.category_name
+FROM competitions co
+LEFT JOIN categories ca ON co.category_id = ca.category_id;
@@ -1,10 +1,15 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
 import pymysql
 import pandas as pd
 import streamlit as st
-import plotly.express as px
+import plotly.graph_objects as go
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # --- DATABASE CONNECTION ---
-@st.cache_resource # Keep using cache_resource for the connection
+POOL_SIZE = 3 # One connection per table loaded in parallel at startup
+
 def get_connection():
     # Ensure you handle potential connection errors in a real app
     try:
@@ -13,36 +18,155 @@ def get_connection():
             user='root',
             password='',        # Use environment variables for sensitive info in production
             database='Tennis_Game',
-            cursorclass=pymysql.cursors.DictCursor # Optional: Easier to work with results
+            # Unbuffered tuple cursor: rows are streamed from the server as fetch_table reads them
+            # (only one open query per connection, which the pool guarantees)
+            cursorclass=pymysql.cursors.SSCursor
         )
         return conn
     except pymysql.Error as e:
         st.error(f"Database connection error: {e}")
         return None # Return None if connection fails
 
+@st.cache_resource # Keep using cache_resource for the connections
+def get_connection_pool():
+    # A pymysql connection can't run two queries at once, so each thread borrows its own
+    pool = queue.Queue()
+    for _ in range(POOL_SIZE):
+        conn = get_connection()
+        if conn is None:
+            # Close the connections opened so far instead of leaking them
+            while not pool.empty():
+                pool.get().close()
+            return None # Return None if connection fails
+        pool.put(conn)
+    return pool
+
 # --- FETCH DATA FROM SQL ---
-@st.cache_data # Keep using cache_data for query results
+FETCH_BATCH_SIZE = 10_000 # Rows pulled from the cursor per fetchmany() call
+CACHE_TTL = 3600 # Seconds before cached query results are reloaded from MySQL
+
+# Not cached itself: every caller is a cached loader/helper that keeps only its final,
+# prepared result, so the raw query result isn't held in the cache a second time
+def read_table(query):
+    # Raises pymysql.Error, so callers decide where the error is shown (see fetch_table / load_all_data)
+    pool = get_connection_pool()
+    if not pool: # Check if connection was successful
+        return pd.DataFrame() # Return empty DataFrame if no connection
+    conn = pool.get() # Blocks until another thread gives a connection back
+    try:
+        # Reconnect if MySQL closed the connection (wait_timeout) or a previous query broke it
+        conn.ping(reconnect=True)
+        # Using 'with' ensures the cursor is closed automatically
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            columns = [desc[0] for desc in cursor.description]
+            # With SSCursor each fetchmany() reads the next batch off the socket,
+            # so the whole result is never buffered twice (client buffer + rows)
+            rows = []
+            while chunk := cursor.fetchmany(FETCH_BATCH_SIZE):
+                rows.extend(chunk)
+        # Build the DataFrame from tuples + column names (no per-row dicts)
+        # pd.read_sql might be simpler, but manual fetching gives more control over errors.
+        # Arrow-backed columns: st.dataframe sends Arrow to the browser, so no re-encode per display
+        return pd.DataFrame.from_records(rows, columns=columns).convert_dtypes(dtype_backend='pyarrow')
+    finally:
+        pool.put(conn) # Don't close here, the pool is kept by @st.cache_resource
+    # Note: pd.read_sql might implicitly handle cursor/connection closure differently
+    # return pd.read_sql(query, conn) # Original way also works
+
 def fetch_table(query):
-    conn = get_connection()
-    if conn: # Check if connection was successful
+    # For the script thread: show the error and fall back to an empty DataFrame
+    try:
+        return read_table(query)
+    except pymysql.Error as e:
+        st.error(f"Error fetching data: {e}")
+        return pd.DataFrame() # Return empty DataFrame on error
+
+# --- FILTER OPTIONS ---
+@st.cache_data(ttl=CACHE_TTL) # Everything the sidebar form needs, in one cache lookup per rerun
+def sidebar_payload():
+    # MySQL does the DISTINCT + ORDER BY (an index walk, see Tennis_Game_indexes.sql),
+    # so only the unique values come back, already sorted: no sorted()/unique() in Python
+    df_countries = fetch_table("SELECT DISTINCT country FROM competitors WHERE country IS NOT NULL ORDER BY country")
+    df_categories = fetch_table("SELECT DISTINCT category_name FROM categories WHERE category_name IS NOT NULL ORDER BY category_name")
+    countries = df_countries["country"].tolist() if not df_countries.empty else []
+    categories = df_categories["category_name"].tolist() if not df_categories.empty else []
+    # value -> position in the option list, so the selectbox default is a dict lookup, not list.index()
+    country_positions = {country: i for i, country in enumerate(countries)}
+    category_positions = {category: i for i, category in enumerate(categories)}
+    return countries, categories, country_positions, category_positions
+
+# --- SQL QUERIES ---
+# The joins are MySQL views (see Tennis_Game_views.sql), so the schema is always the same
+RANKINGS_QUERY = "SELECT * FROM v_rankings"
+VENUES_QUERY = "SELECT * FROM v_venues"
+COMPETITIONS_QUERY = "SELECT * FROM v_competitions"
+
+# --- LOAD DATA ---
+# One loader per table, run in parallel by load_all_data() and cached there as a whole:
+# the loaders themselves aren't cached, so each frame is held in the cache only once
+# The filter row positions (value -> row positions, built in one groupby pass) are returned
+# together with the frame they index into, so both always expire and reload together
+def load_rankings():
+    # The joined tables come back already merged (see the queries above)
+    df_merged = read_table(RANKINGS_QUERY)
+    if df_merged.empty:
+        return df_merged, {}
+    # Store the filter columns as categoricals: filtering compares small integer codes, not strings
+    df_merged['country'] = df_merged['country'].astype('category')
+    # Downcast the ranking numbers to the smallest integer type that fits (int64 -> int8/16/32)
+    # The ids are VARCHAR in this schema, so there is nothing to downcast in the other tables
+    for col in ['rank', 'movement', 'points', 'competitions_played']:
+        df_merged[col] = pd.to_numeric(df_merged[col], downcast='integer')
+    country_rows = df_merged.groupby('country', observed=True, sort=False).indices
+    return df_merged, country_rows
+
+def load_venue_info():
+    return read_table(VENUES_QUERY)
+
+def load_comp_info():
+    comp_info = read_table(COMPETITIONS_QUERY)
+    if comp_info.empty:
+        return comp_info, {}
+    comp_info['category_name'] = comp_info['category_name'].astype('category')
+    category_rows = comp_info.groupby('category_name', observed=True, sort=False).indices
+    return comp_info, category_rows
+
+@st.cache_data(ttl=CACHE_TTL) # Threads are only started on a cold load, reruns are a cache hit
+def load_all_data():
+    # Run the loaders in parallel, each thread on its own pooled connection
+    ctx = get_script_run_ctx() # Worker threads need the script context for the cached pool lookup
+    with ThreadPoolExecutor(max_workers=POOL_SIZE, initializer=lambda: add_script_run_ctx(ctx=ctx)) as executor:
+        futures = [executor.submit(loader) for loader in (load_rankings, load_venue_info, load_comp_info)]
+    # What each loader returns when its query fails
+    fallbacks = [(pd.DataFrame(), {}), pd.DataFrame(), (pd.DataFrame(), {})]
+    results = []
+    for future, fallback in zip(futures, fallbacks):
         try:
-            # Using 'with' ensures the cursor is closed automatically
-            with conn.cursor() as cursor:
-                cursor.execute(query)
-                result = cursor.fetchall()
-            # Create DataFrame from the list of dictionaries (if using DictCursor)
-            # If not using DictCursor, pd.read_sql might be simpler,
-            # but manual fetching gives more control over errors.
-            df = pd.DataFrame(result)
-            # conn.close() # Don't close here if using @st.cache_resource
-            return df
+            results.append(future.result())
         except pymysql.Error as e:
+            # Shown here on the script thread, so cache hits replay the error too
             st.error(f"Error fetching data: {e}")
-            return pd.DataFrame() # Return empty DataFrame on error
-        # Note: pd.read_sql might implicitly handle cursor/connection closure differently
-        # return pd.read_sql(query, conn) # Original way also works
-    else:
-        return pd.DataFrame() # Return empty DataFrame if no connection
+            results.append(fallback)
+    # ((df_merged, country_rows), venue_info, (comp_info, category_rows))
+    return tuple(results)
+
+# --- SUMMARIES ---
+# These always use the overall (unfiltered) rankings, so compute them once per data load
+@st.cache_data(ttl=CACHE_TTL)
+def get_top10():
+    # MySQL walks the rank index and sends back only 10 rows (see Tennis_Game_indexes.sql)
+    # Note: `rank` is a reserved word in MySQL 8, so it has to be quoted
+    return fetch_table(RANKINGS_QUERY + " ORDER BY `rank` LIMIT 10")
+
+@st.cache_data(ttl=CACHE_TTL)
+def get_country_counts():
+    # Only called once the script has loaded the data (see Load Data), so this is a cache hit
+    (df, _), _, _ = load_all_data()
+    if df.empty:
+        return df
+    # One row per country, so the chart gets the counts instead of every player row
+    return df['country'].value_counts().rename_axis('country').reset_index(name='players')
 
 # --- Initialize Session State ---
 # This ensures these variables exist across script reruns for the user session
@@ -52,38 +176,21 @@ if 'filters_applied' not in st.session_state:
     st.session_state.submitted_category = None
 
 # --- Load Data ---
-# Put data loading inside a function or check to avoid reloading constantly if possible
-# For simplicity here, we load it once. Use caching effectively.
-conn = get_connection()
+# Loading, joining and type conversion all happen inside the cached load_all_data()
+conn = get_connection_pool()
 if conn: # Only proceed if connection is established
-    df_competitors = fetch_table("SELECT * FROM competitors")
-    df_rankings = fetch_table("SELECT * FROM competitor_rankings")
-    df_complexes = fetch_table("SELECT * FROM complexes")
-    df_venues = fetch_table("SELECT * FROM venues")
-    df_category = fetch_table("SELECT * FROM categories")
-    df_competition = fetch_table("SELECT * FROM competitions")
-
-    # Check if DataFrames are empty before proceeding
-    if not df_competitors.empty and not df_rankings.empty:
-        df_merged = pd.merge(df_rankings, df_competitors, on="competitor_id", how="left")
-    else:
-        df_merged = pd.DataFrame() # Create empty if data missing
-
-    if not df_venues.empty and not df_complexes.empty:
-        venue_info = pd.merge(df_venues, df_complexes, on="complex_id", how="left")
-    else:
-        venue_info = pd.DataFrame()
-
-    if not df_competition.empty and not df_category.empty:
-        comp_info = pd.merge(df_competition, df_category, on="category_id", how="left")
-    else:
-        comp_info = pd.DataFrame()
+    (df_merged, country_rows), venue_info, (comp_info, category_rows) = load_all_data()
+    # Sidebar options and overall summaries (all cached)
+    country_list, category_list, country_positions, category_positions = sidebar_payload()
+    top10 = get_top10()
+    country_counts = get_country_counts()
 
 else: # Handle case where initial connection failed
     st.error("Failed to connect to the database. Cannot load data.")
     # Assign empty dataframes to prevent errors later
-    df_competitors = df_rankings = df_complexes = df_venues = df_category = df_competition = pd.DataFrame()
-    df_merged = venue_info = comp_info = pd.DataFrame()
+    df_merged = venue_info = comp_info = top10 = country_counts = pd.DataFrame()
+    country_rows = category_rows = {}
+    country_list, category_list, country_positions, category_positions = [], [], {}, {}
 
 
 # --- SIDEBAR FILTERS ---
@@ -91,24 +198,17 @@ st.sidebar.header("🔍 Filters")
 
 # Use st.form to group inputs and submit button
 with st.sidebar.form("filter_form"):
-    # Get unique values, handle potential errors if df is empty
-    country_list = sorted(df_competitors['country'].dropna().unique()) if not df_competitors.empty else []
-    category_list = sorted(df_category['category_name'].dropna().unique()) if not df_category.empty else []
+    # Unique values and their positions come from sidebar_payload (see Load Data)
 
     # Set default index based on previous submission if available
     default_country_index = 0
-    if st.session_state.filters_applied and st.session_state.submitted_country in country_list:
-       try:
-           default_country_index = country_list.index(st.session_state.submitted_country)
-       except ValueError:
-           default_country_index = 0 # Fallback if value not found
+    if st.session_state.filters_applied:
+        # Fallback to 0 if the value is no longer in the list
+        default_country_index = country_positions.get(st.session_state.submitted_country, 0)
 
     default_category_index = 0
-    if st.session_state.filters_applied and st.session_state.submitted_category in category_list:
-        try:
-            default_category_index = category_list.index(st.session_state.submitted_category)
-        except ValueError:
-            default_category_index = 0 # Fallback
+    if st.session_state.filters_applied:
+        default_category_index = category_positions.get(st.session_state.submitted_category, 0)
 
     # Selectboxes inside the form
     selected_country = st.selectbox(
@@ -143,6 +243,18 @@ if clear_filters:
     st.sidebar.info("Filters Cleared. Showing all data.")
     # st.experimental_rerun() # Optional: Force rerun to immediately reset selectbox index
 
+# Refresh button: drop every cached query result and the connection pool, then reload from the database
+if st.sidebar.button("Refresh Data"):
+    st.cache_data.clear()
+    if conn: # Close the old pool's connections so they don't count against max_connections
+        while not conn.empty():
+            try:
+                conn.get().close()
+            except pymysql.Error:
+                pass # Already closed by the server, nothing to release
+    get_connection_pool.clear()
+    st.rerun()
+
 # --- MAIN LAYOUT ---
 st.title("🎾Tennis Game Dashboard")
 
@@ -155,13 +267,15 @@ st.info(f"Displaying data for Country: **{display_country}**, Category: **{displ
 
 # --- Apply Filters based on Session State ---
 # Only filter if 'filters_applied' is True and the corresponding state variable has a value
-filtered_df = df_merged.copy() # Start with a copy of the full data
-if st.session_state.filters_applied and st.session_state.submitted_country and not filtered_df.empty:
-    filtered_df = filtered_df[filtered_df['country'] == st.session_state.submitted_country]
+# The row positions per value are precomputed (see load_rankings), so no column scan here
+# No copy needed: the frames are only displayed, and take() already returns a new frame
+filtered_df = df_merged # Start with the full data
+if st.session_state.filters_applied and st.session_state.submitted_country and not df_merged.empty:
+    filtered_df = df_merged.take(country_rows.get(st.session_state.submitted_country, []))
 
-filtered_comp = comp_info.copy() # Start with a copy
-if st.session_state.filters_applied and st.session_state.submitted_category and not filtered_comp.empty:
-    filtered_comp = filtered_comp[filtered_comp['category_name'] == st.session_state.submitted_category]
+filtered_comp = comp_info # Start with the full data
+if st.session_state.filters_applied and st.session_state.submitted_category and not comp_info.empty:
+    filtered_comp = comp_info.take(category_rows.get(st.session_state.submitted_category, []))
 
 
 # --- Display Data ---
@@ -174,8 +288,7 @@ with col1:
 with col2:
     st.subheader("🏆 Top 10 Players (Overall)")
     # Usually Top 10 is based on the overall data, not the filtered one, unless specified otherwise
-    if not df_merged.empty:
-        top10 = df_merged.sort_values("rank").head(10)
+    if not top10.empty:
         st.dataframe(top10)
     else:
         st.write("No ranking data available.")
@@ -191,34 +304,42 @@ st.dataframe(filtered_comp) # Display the potentially filtered competition info
 
 # --- VISUALIZATION ---
 st.markdown("---")
-st.header("📈 Analysis")
-
-# Histogram - Show overall distribution unless filters are applied
-if not df_merged.empty:
-    # Decide if histogram should be filtered or always show all countries
-    # Option 1: Always show all countries
-    hist_data = df_merged
-    hist_title = "Number of Players per Country (Overall)"
-    # # Option 2: Show only filtered country in histogram (might not be very useful for histogram)
-    # if st.session_state.filters_applied and st.session_state.submitted_country:
-    #     hist_data = filtered_df
-    #     hist_title = f"Players in {st.session_state.submitted_country}"
-    # else:
-    #     hist_data = df_merged
-    #     hist_title = "Number of Players per Country (Overall)"
-
-    fig = px.histogram(hist_data, x="country", title=hist_title, color_discrete_sequence=['#EF553B'])
-    st.plotly_chart(fig, use_container_width=True)
-else:
-    st.write("No data for player distribution plot.")
-
-
-# Bar Chart - Show Overall Top 10
-if 'top10' in locals() and not top10.empty: # Check if top10 exists and is not empty
-    fig2 = px.bar(top10, x='name', y='points', color='points', title='Top 10 Players by Points (Overall)')
-    st.plotly_chart(fig2, use_container_width=True)
-else:
-    st.write("No data for top 10 players plot.")
+
+# The charts have no widgets or on_select, so this fragment never reruns on its own and saves
+# nothing today; it only scopes future in-fragment interactions to this block
+@st.fragment
+def analysis_block(country_counts, top10):
+    st.header("📈 Analysis")
+
+    # Players per country - Always show all countries (pre-counted, see get_country_counts)
+    if not country_counts.empty:
+        hist_title = "Number of Players per Country (Overall)"
+        # go.Bar takes the arrays as-is, no Plotly Express grouping pass over the DataFrame
+        fig = go.Figure(go.Bar(
+            x=country_counts['country'].to_numpy(),
+            y=country_counts['players'].to_numpy(),
+            marker_color='#EF553B'
+            ))
+        fig.update_layout(title=hist_title, xaxis_title="country", yaxis_title="players")
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.write("No data for player distribution plot.")
+
+
+    # Bar Chart - Show Overall Top 10
+    if not top10.empty:
+        points = top10['points'].to_numpy()
+        fig2 = go.Figure(go.Bar(
+            x=top10['name'].to_numpy(),
+            y=points,
+            marker=dict(color=points, colorscale='Plasma', showscale=True, colorbar=dict(title='points'))
+            ))
+        fig2.update_layout(title='Top 10 Players by Points (Overall)', xaxis_title='name', yaxis_title='points')
+        st.plotly_chart(fig2, use_container_width=True)
+    else:
+        st.write("No data for top 10 players plot.")
+
+analysis_block(country_counts, top10)
 
 # Add a placeholder if connection failed initially
 if not conn: